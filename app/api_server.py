@@ -284,11 +284,11 @@ def extract_searchable_text(request: BaseRequest) -> OCRTextResponse:
         with save_base64_to_temp_pdf(request.pdf_base64) as temp_pdf_path:
             if not temp_pdf_path:
                 raise HTTPException(status_code=400, detail="Invalid base64 string provided.")
-            text_json = extract_text_if_searchable(temp_pdf_path)
-            if not text_json:
-                text_json = ["pdf is not searchable or no text found."]
+            page_texts = extract_text_if_searchable(temp_pdf_path)
+            if not page_texts:
+                page_texts = ["pdf is not searchable or no text found."]
                 
-            return OCRTextResponse(ocr_text=text_json)
+            return OCRTextResponse(ocr_text=page_texts)
     except Exception as e:
         handle_error(e)
         return OCRTextResponse(ocr_text=[""])
@@ -311,13 +311,13 @@ def llm_extract(request: LLMExtractRequest) -> InvoiceExtractionResponse:
     """
     try:
         extracted_data_tuple = ollama_extract_invoice_fields(request.ocr_pages)
-        api_logger.info(f"Extracted data tuple type: {type(extracted_data_tuple)}")
-        api_logger.info(f"Extracted data tuple length: {len(extracted_data_tuple) if hasattr(extracted_data_tuple, '__len__') else 'N/A'}")
+        api_logger.info("Extracted data tuple type: %s", type(extracted_data_tuple))
+        api_logger.info("Extracted data tuple length: %s", len(extracted_data_tuple) if hasattr(extracted_data_tuple, '__len__') else 'N/A')
         
         # Unpack the tuple to get just the dictionary (ignore the duration)
         extracted_data, duration = extracted_data_tuple
-        api_logger.info(f"Extracted data type: {type(extracted_data)}")
-        api_logger.info(f"Extracted data content: {extracted_data}")
+        api_logger.info("Extracted data type: %s", type(extracted_data))
+        api_logger.info("Extracted data content: %s", extracted_data)
         
         # Ensure extracted_data is a dictionary
         if not isinstance(extracted_data, dict):
@@ -287,6 +287,9 @@ def main():
         - summary_{model}.csv: Zusammenfassung pro Rechnung
         - results_{model}.csv: Aggregierte Pipeline-Performance
     """
+    # Cached LLM results would distort accuracy and duration measurements
+    os.environ["IDP_LLM_CACHE"] = "0"
+
     completed_work = set()
     if os.path.exists(OUTPUT_SUMMARY_CSV):
         with open(OUTPUT_SUMMARY_CSV, "r", encoding="utf-8") as f:
@@ -301,11 +304,15 @@ def main():
     all_engines = get_available_engines()
     all_engines_with_searchable = all_engines + ["searchable"]
 
+    # One directory listing instead of an exists() stat per PDF
+    labels_dir = Path(LABELS_DIR)
+    label_stems = {label.stem for label in labels_dir.glob("*.json")}
+
     pdf_searchable_map = {}
     for pdf_path in all_pdfs:
         base_name = pdf_path.stem
-        label_path = Path(LABELS_DIR) / f"{base_name}.json"
-        if not label_path.exists():
+        label_path = labels_dir / f"{base_name}.json"
+        if base_name not in label_stems:
             benchmark_logger.warning(f"No label file for '{base_name}.pdf'. Skipping.")
             continue
         # Determine if PDF is searchable
@@ -23,6 +23,12 @@ from typing import Dict
 
 from app.post_processing import canon_number
 
+# Precompiled patterns for text and ID canonicalization
+_CONJUNCTION_RE = re.compile(r'\s*&\s*|\s*und\s*')
+_GMBH_RE = re.compile(r'\bgmbh\.?|\bgesellschaft mit beschränkter haftung')
+_AG_RE = re.compile(r'\bag\.?|\baktiengesellschaft')
+_NON_ID_CHARS_RE = re.compile(r"[^A-Z0-9]")
+
 
 def canon_text(s: str | None) -> str:
     """
@@ -50,9 +56,9 @@ def canon_text(s: str | None) -> str:
     s = unicodedata.normalize("NFKD", str(s).lower())
 
     # Standardize conjunctions and common abbreviations
-    s = re.sub(r'\s*&\s*|\s*und\s*', ' and ', s)
-    s = re.sub(r'\bgmbh\.?|\bgesellschaft mit beschränkter haftung', '', s)
-    s = re.sub(r'\bag\.?|\baktiengesellschaft', '', s)
+    s = _CONJUNCTION_RE.sub(' and ', s)
+    s = _GMBH_RE.sub('', s)
+    s = _AG_RE.sub('', s)
 
     # Remove all non-alphanumeric characters except for spaces
     s = ''.join(c for c in s if c.isalnum() or c.isspace())
@@ -102,7 +108,7 @@ def _canon_id(s: str | None) -> str:
         str: Bereinigte ID nur mit Großbuchstaben und Zahlen
     """
     if not s: return ""
-    return re.sub(r"[^A-Z0-9]", "", str(s).upper())
+    return _NON_ID_CHARS_RE.sub("", str(s).upper())
 
 
 def is_match(field: str, true_val, pred_val) -> bool:
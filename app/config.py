@@ -8,6 +8,11 @@ Umgebungsvariablen geladen und stellt sinnvolle Defaults bereit.
 Umgebungsvariablen:
 - OLLAMA_BASE_URL: URL der Ollama-Instanz (z.B. http://localhost:11434)
 - OLLAMA_MODEL: Name des zu verwendenden LLM-Modells (z.B. llama3.1:8b)
+- OLLAMA_CONCURRENCY: Max. gleichzeitige Ollama-Anfragen pro Prozess (optional)
+- OCR_MAX_WORKERS: Max. Anzahl paralleler Tesseract-Threads pro Prozess (optional)
+- TESSERACT_USE_TESSEROCR: '0' erzwingt die Tesseract-CLI statt tesserocr (optional)
+- IDP_LLM_CACHE: '1' aktiviert den LLM-Ergebnis-Cache auf der Festplatte (optional)
+- IDP_LLM_CACHE_TTL_HOURS: Gültigkeitsdauer von Cache-Einträgen in Stunden (optional)
 
 Autor: Ghazi Nakkash
 Projekt: Konzeption und prototypische Implementierung einer KI-basierten und 
@@ -53,12 +58,26 @@ USER_PROMPT_FILE = EXTRACT_USER_PROMPT
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL")
 CHAT_ENDPOINT = f"{OLLAMA_BASE_URL}/api/chat" if OLLAMA_BASE_URL else None
+# Match Ollama's OLLAMA_NUM_PARALLEL so requests don't time out in its queue
+OLLAMA_CONCURRENCY = int(os.getenv("OLLAMA_CONCURRENCY", "4"))
+
+# =============================================================================
+# --- OCR Configuration ---
+# =============================================================================
+# Size of the process-wide Tesseract (tesserocr) OCR thread pool
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", os.cpu_count() or 1))
+# Use the in-process tesserocr API when installed; '0' forces the Tesseract CLI
+TESSERACT_USE_TESSEROCR = os.getenv("TESSERACT_USE_TESSEROCR", "1") != "0"
 
 # =============================================================================
 # --- File storage paths ---
 # =============================================================================
 # Temporary directory for processing
 TMP_DIR = str(PROJECT_ROOT / 'app' / 'tmp')
+# On-disk cache for LLM extraction results (keyed by input hash), opt-in via IDP_LLM_CACHE=1;
+# created on first write. Entries contain invoice data and expire after the TTL.
+LLM_CACHE_DIR = str(Path(TMP_DIR) / 'llm_cache')
+LLM_CACHE_TTL_SECONDS = float(os.getenv("IDP_LLM_CACHE_TTL_HOURS", "24")) * 3600
 
 # =============================================================================
 # --- Benchmark Configuration ---
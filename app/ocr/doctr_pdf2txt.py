@@ -11,6 +11,7 @@ Projekt: Konzeption und prototypische Implementierung einer KI-basierten und
 Institution: Hochschule für Technik und Wirtschaft Berlin
 """
 import logging
+from operator import itemgetter
 from typing import List, Dict, Any, Union
 
 from doctr.io import DocumentFile
@@ -18,6 +19,10 @@ from doctr.models import ocr_predictor
 
 from app.logging_config import ocr_logger
 
+# Sortierschlüssel (y0, x0) für die Linien-Tupel, ausgewertet in C
+_Y_X_KEY = itemgetter(0, 1)
+_TEXT = itemgetter(2)
+
 
 def doctr_pdf_to_text(pdf_path: str) -> List[str]:
     """
@@ -45,36 +50,24 @@ def doctr_pdf_to_text(pdf_path: str) -> List[str]:
         
         # 2. Daten extrahieren und nach Seiten gruppieren
         data = result.export()
-        pages_to_lines = {}
+        text_pages = []
         
         # Text extrahieren
-        for page_index, page in enumerate(data.get("pages", []), start=1):
+        for page in data.get("pages", []):
             width, height = page.get("dimensions", (1, 1))
-            pages_to_lines.setdefault(page_index, [])
+            # (y0, x0, text) je Linie; der Sortierschlüssel steht direkt im Tupel
+            lines = []
             
             # Linien aus Blöcken extrahieren
             for block in page.get("blocks", []):
                 for line in block.get("lines", []):
-                    (x0n, y0n), (x1n, y1n) = line.get("geometry", ((0, 0), (0, 0)))
-                    abs_bbox = [
-                        int(x0n * width),
-                        int(y0n * height),
-                        int(x1n * width),
-                        int(y1n * height),
-                    ]
+                    (x0n, y0n), _ = line.get("geometry", ((0, 0), (0, 0)))
                     text = " ".join(w.get("value", "") for w in line.get("words", []))
-                    pages_to_lines[page_index].append({
-                        "text": text,
-                        "bbox": abs_bbox,
-                    })
-        
-        # Reiner Text ohne Koordinaten nach Seiten
-        text_pages = []
-        for page_num in sorted(pages_to_lines.keys()):
-            lines = pages_to_lines[page_num]
-            lines.sort(key=lambda l: (l['bbox'][1], l['bbox'][0]))
-            plain_text = "\n".join(line["text"] for line in lines)
-            text_pages.append(plain_text)
+                    lines.append((int(y0n * height), int(x0n * width), text))
+            
+            # Reiner Text ohne Koordinaten: von oben nach unten, links nach rechts
+            lines.sort(key=_Y_X_KEY)
+            text_pages.append("\n".join(map(_TEXT, lines)))
         
         return text_pages
             
@@ -12,13 +12,10 @@ Institution: Hochschule für Technik und Wirtschaft Berlin
 """
 
 import sys
-import logging
 from typing import List, Dict, Any, Union, cast
 import easyocr
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger("easyocr_engine")
+from app.logging_config import ocr_logger
 
 def easyocr_png_to_text(png_path: str, languages: List[str] = ['de']) -> str:
     """
@@ -42,7 +39,7 @@ def easyocr_png_to_text(png_path: str, languages: List[str] = ['de']) -> str:
     reader = easyocr.Reader(languages, gpu=False)
     # EasyOCR returns: [[bbox, text, confidence], ...]
     results = reader.readtext(png_path)
-    logger.info(f"EasyOCR found {len(results)} text regions")
+    ocr_logger.info(f"EasyOCR found {len(results)} text regions")
     
     # Return just the text, joined by newlines
     texts = []
@@ -62,21 +59,21 @@ if __name__ == "__main__":
     
     # Example usage
     if not SAMPLE_PNG_PATH:
-        logger.error("SAMPLE_PNG_PATH not set in environment")
+        ocr_logger.error("SAMPLE_PNG_PATH not set in environment")
         sys.exit(1)
         
     # Convert None to default values if needed
     png_file = SAMPLE_PNG_PATH or ""
     
     if not png_file:
-        logger.error("Sample PNG path cannot be empty")
+        ocr_logger.error("Sample PNG path cannot be empty")
         sys.exit(1)
         
     try:
         # Show text output
         text_output = easyocr_png_to_text(png_file)
         preview = text_output[:200] if len(text_output) > 200 else text_output
-        logger.info(f"EasyOCR Text Output:\n{preview}...")
+        ocr_logger.info(f"EasyOCR Text Output:\n{preview}...")
     
     except RuntimeError as e:
-        logger.error(f"Error: {e}") 
\ No newline at end of file
+        ocr_logger.error(f"Error: {e}") 
\ No newline at end of file
@@ -13,6 +13,7 @@ Institution: Hochschule für Technik und Wirtschaft Berlin
 """
 import os
 import re
+from operator import itemgetter
 from typing import List, Dict, Any, Union, cast
 
 import numpy as np
@@ -22,6 +23,12 @@ import logging
 
 from app.logging_config import ocr_logger
 
+# Collapses whitespace runs in the merged token texts
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Text of a token / text object, for joining via map()
+_TEXT = itemgetter("text")
+
 # Initialize processor once
 _PROCESSOR = LayoutLMv3Processor.from_pretrained("microsoft/layoutlmv3-large")
 
@@ -149,10 +156,10 @@ def layoutlm_image_to_text(image_path: str) -> str:
         
         for chunk in text_chunks:
             # Token-Texte zu vollständigem Text zusammenfügen
-            raw_text = "".join(t["text"] for t in chunk)
+            raw_text = "".join(map(_TEXT, chunk))
 
             # Text bereinigen
-            text = re.sub(r"\s+", " ", raw_text.replace("Ġ", " ")).strip()
+            text = _WHITESPACE_RE.sub(" ", raw_text.replace("Ġ", " ")).strip()
 
             # Leere Chunks überspringen
             if not text:
@@ -169,7 +176,7 @@ def layoutlm_image_to_text(image_path: str) -> str:
         # Reiner Text ohne Koordinaten zurückgeben
         # Text-Chunks nach vertikaler Position sortieren und zusammenfügen
         sorted_objects = sorted(text_objects, key=lambda obj: (obj["bbox"][1] + obj["bbox"][3]) / 2)
-        plain_text = "\n".join(obj["text"] for obj in sorted_objects)
+        plain_text = "\n".join(map(_TEXT, sorted_objects))
         return plain_text
             
     except Exception as e:
@@ -27,13 +27,12 @@ import os
 from typing import Callable, Dict, List
 
 
-
 from app.ocr.doctr_pdf2txt import doctr_pdf_to_text
 from app.ocr.layoutlmv3_png2txt import layoutlm_image_to_text
-from app.ocr.tesseract_ocr import tesseract_png_to_text
+from app.ocr.tesseract_ocr import USE_TESSEROCR, tesseract_arrays_to_text, tesseract_pngs_to_text
 from app.ocr.easyocr_engine import easyocr_png_to_text
 from app.ocr.paddle_ocr import paddleocr_pdf_to_text
-from app.ocr.pdf_utils import pdf_to_png_with_pymupdf
+from app.ocr.pdf_utils import pdf_to_gray_arrays_with_pymupdf, pdf_to_png_with_pymupdf
 from app.logging_config import ocr_logger
 
 
@@ -55,15 +54,13 @@ def process_pdf_with_ocr(pdf_path: str, ocr_function: Callable) -> List[str] | N
     """
     base_name = os.path.splitext(os.path.basename(pdf_path))[0]
     ocr_engine_name = ocr_function.__name__
-    ocr_logger.info(f"Verarbeite '{base_name}.pdf' mit der Engine '{ocr_engine_name}'…")
-    pages_content = []
+    ocr_logger.info("Verarbeite '%s.pdf' mit der Engine '%s'…", base_name, ocr_engine_name)
     try:
         png_pages: List[str] = pdf_to_png_with_pymupdf(pdf_path)
-        for i, png_page in enumerate(png_pages):
-            page_num = i + 1
-            extracted_content = ocr_function(png_page)
-            pages_content.append(extracted_content)
-            ocr_logger.info(f"Seite {page_num} von '{base_name}.pdf' erfolgreich verarbeitet.")
+        pages_content = []
+        for page_num, png_page in enumerate(png_pages, start=1):
+            pages_content.append(ocr_function(png_page))
+            ocr_logger.info("Seite %d von '%s.pdf' erfolgreich verarbeitet.", page_num, base_name)
         return pages_content
     except Exception as e:
         ocr_logger.exception(f"Ein Fehler ist bei der Verarbeitung von '{base_name}.pdf' mit '{ocr_engine_name}' aufgetreten: {e}")
@@ -91,8 +88,21 @@ def tesseract_process_pdf(pdf_path: str) -> List[str] | None:
         
     Returns:
         List[str] | None: Erkannter Text pro Seite oder None bei Fehlern
+
+    Note:
+        Mit tesserocr werden die Seiten direkt als Graustufenbilder in den
+        Speicher gerendert (ohne PNG-Dateien) und in Threads parallel
+        verarbeitet (in den Benchmark-Workern sequentiell), ohne tesserocr
+        werden alle Seiten in einem einzigen Tesseract-Prozess erkannt.
     """
-    return process_pdf_with_ocr(pdf_path, tesseract_png_to_text)
+    try:
+        if USE_TESSEROCR:
+            return tesseract_arrays_to_text(pdf_to_gray_arrays_with_pymupdf(pdf_path))
+        png_pages: List[str] = pdf_to_png_with_pymupdf(pdf_path)
+        return tesseract_pngs_to_text(png_pages)
+    except Exception as e:
+        ocr_logger.exception(f"Fehler bei Tesseract-OCR für '{pdf_path}': {e}")
+        return None
 
 def layoutlm_process_pdf(pdf_path: str) -> List[str] | None:
     """
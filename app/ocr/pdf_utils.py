@@ -8,6 +8,7 @@ Es dient als Grundlage für die OCR-Pipeline und API-Endpunkte.
 Hauptfunktionen:
 - Base64-PDF-Dekodierung mit automatischem Cleanup
 - PDF-zu-PNG-Konvertierung für OCR-Verarbeitung
+- Rendern von PDF-Seiten als Graustufen-Arrays im Speicher
 - Extrahierung von durchsuchbarem Text aus PDFs
 
 Verwendete Bibliotheken:
@@ -25,8 +26,10 @@ import logging
 import os
 import tempfile
 from contextlib import contextmanager
+from typing import Iterator
 
 import fitz
+import numpy as np
 
 from app.config import TMP_DIR
 
@@ -96,21 +99,26 @@ def extract_text_if_searchable(pdf_path: str) -> list[str]:
         RuntimeError: Bei PDF-Öffnungsfehlern oder beschädigten Dateien
         
     Note:
-        Gibt leere Liste zurück für gescannte PDFs ohne eingebetteten Text.     
+        Gibt leere Liste zurück für gescannte PDFs ohne eingebetteten Text.
+        Hat die erste Seite keinen Text, aber ein Rasterbild, wird die
+        Extraktion sofort abgebrochen.
     """
     try:
-        doc = fitz.open(pdf_path)
+        # Explicit filetype skips content sniffing
+        doc = fitz.open(pdf_path, filetype="pdf")
     except Exception as e:
         pdf_logger.exception(f"PDF konnte nicht geöffnet werden: {pdf_path}")
         raise RuntimeError(f"Could not open PDF: {e}")
-    page_texts = []
-    for page in doc:
-        text = page.get_text()
-        if isinstance(text, str):
-            page_texts.append(text.strip())
-        else:
-            page_texts.append("")
-    return page_texts
+    # Context manager releases MuPDF's caches right away instead of on GC
+    with doc:
+        if doc.page_count == 0:
+            return []
+        first_text = doc[0].get_text("text").strip()
+        # Scanned document: no text layer on page 1 but a raster image → skip remaining pages
+        if not first_text and doc[0].get_images(full=False):
+            pdf_logger.info(f"PDF ist nicht durchsuchbar (gescannte erste Seite): {pdf_path}")
+            return []
+        return [first_text] + [doc[i].get_text("text").strip() for i in range(1, doc.page_count)]
 
 def pdf_to_png_with_pymupdf(pdf_path: str, zoom: float = 3.0) -> list[str]:
     """
@@ -135,19 +143,53 @@ def pdf_to_png_with_pymupdf(pdf_path: str, zoom: float = 3.0) -> list[str]:
         
      """
     try:
-        doc = fitz.open(pdf_path)
-        if doc.page_count == 0:
-            pdf_logger.error(f"Keine Seiten in PDF: {pdf_path}")
-            raise RuntimeError(f"Keine Seiten in PDF: {pdf_path}")
-        base = os.path.splitext(os.path.basename(pdf_path))[0]
-        png_paths = []
-        for i, page in enumerate(doc):
+        # Context manager releases MuPDF's caches right away instead of on GC
+        with fitz.open(pdf_path) as doc:
+            if doc.page_count == 0:
+                pdf_logger.error(f"Keine Seiten in PDF: {pdf_path}")
+                raise RuntimeError(f"Keine Seiten in PDF: {pdf_path}")
+            base = os.path.splitext(os.path.basename(pdf_path))[0]
             mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat, alpha=False)
-            png_path = os.path.join(TMP_DIR, f"{base}_page{i + 1}.png")
-            pix.save(png_path)
-            png_paths.append(png_path)
-        return png_paths
+            png_paths = []
+            for i, page in enumerate(doc):
+                pix = page.get_pixmap(matrix=mat, alpha=False)
+                png_path = os.path.join(TMP_DIR, f"{base}_page{i + 1}.png")
+                pix.save(png_path)
+                png_paths.append(png_path)
+            return png_paths
     except Exception as e:
         pdf_logger.exception(f"Fehler bei PDF-zu-PNG-Konvertierung mit PyMuPDF: {pdf_path}")
-        raise
\ No newline at end of file
+        raise
+
+
+def pdf_to_gray_arrays_with_pymupdf(pdf_path: str, zoom: float = 3.0) -> Iterator[np.ndarray]:
+    """
+    Rendert PDF-Seiten als 8-Bit-Graustufenbilder direkt in den Speicher.
+
+    Im Gegensatz zu pdf_to_png_with_pymupdf entfallen PNG-Kodierung,
+    Dateisystemzugriff und erneutes Dekodieren durch die OCR-Engine. MuPDF
+    rendert direkt in Graustufen, sodass auch die Farbkonvertierung entfällt.
+    Die Seiten werden einzeln erzeugt, damit die OCR bereits während des
+    Renderns der Folgeseiten starten kann.
+
+    Args:
+        pdf_path (str): Pfad zur PDF-Datei
+        zoom (float, optional): Zoom-Faktor für die Auflösung.
+                               3.0 entspricht etwa 300 DPI. Defaults to 3.0.
+
+    Yields:
+        np.ndarray: Graustufenbild (uint8, Höhe × Breite) pro PDF-Seite
+
+    Raises:
+        RuntimeError: Bei leeren PDFs
+        Exception: Bei PDF-Öffnungs- oder Renderfehlern
+    """
+    mat = fitz.Matrix(zoom, zoom)
+    with fitz.open(pdf_path) as doc:
+        if doc.page_count == 0:
+            pdf_logger.error(f"Keine Seiten in PDF: {pdf_path}")
+            raise RuntimeError(f"Keine Seiten in PDF: {pdf_path}")
+        for page in doc:
+            pix = page.get_pixmap(matrix=mat, colorspace=fitz.csGRAY, alpha=False)
+            # Rows may be padded beyond the image width
+            yield np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
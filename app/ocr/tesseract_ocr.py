@@ -5,19 +5,176 @@ Dieses Modul implementiert die Integration von Tesseract OCR
 für die Texterkennung aus PNG-Bildern. Tesseract ist eine der
 ältesten und bewährtesten Open-Source-OCR-Engines.
 
+Bevorzugt wird die In-Process-API von tesserocr verwendet: Die Engine
+und das 'deu'-Modell werden einmalig geladen und für alle Seiten
+wiederverwendet. Ist tesserocr nicht installiert, wird auf die Tesseract-CLI
+(Pfad aus pytesseract.tesseract_cmd) zurückgegriffen: ein Prozess pro PDF
+bzw. pro Einzelseite, Bild und Text laufen über stdin/stdout. Mit tesserocr
+können Seiten auch direkt als Graustufen-Arrays (ohne PNG-Dateien)
+verarbeitet werden.
+
+Mit tesserocr laufen bis zu OCR_MAX_WORKERS Erkennungen parallel in
+Threads. Damit Tesseracts eigene OpenMP-Threads die Kerne nicht zusätzlich
+überbelegen, sollte der Prozess mit OMP_THREAD_LIMIT=1 gestartet werden
+(die Variable wird beim Laden der OpenMP-Laufzeit gelesen und kann zur
+Laufzeit nicht mehr wirksam gesetzt werden).
+
 Autor: Ghazi Nakkash
 Projekt: Konzeption und prototypische Implementierung einer KI-basierten und 
          intelligenten Dokumentenverarbeitung im Rechnungseingangsprozess
 Institution: Hochschule für Technik und Wirtschaft Berlin
 """
 
-import logging
+import io
+import multiprocessing
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List
 
-from pytesseract import image_to_string
+import numpy as np
+import pytesseract
+from PIL import Image
 
+try:
+    from tesserocr import PyTessBaseAPI, PSM
+except ImportError:
+    PyTessBaseAPI = None
+    PSM = None
 
+from app.config import OCR_MAX_WORKERS, TESSERACT_USE_TESSEROCR
 from app.logging_config import ocr_logger
 
+# Wird beim Import festgelegt; TESSERACT_USE_TESSEROCR=0 erzwingt den CLI-Pfad
+USE_TESSEROCR = PyTessBaseAPI is not None and TESSERACT_USE_TESSEROCR
+
+# Initialisierte 'deu'-APIs zur Wiederverwendung; eine Instanz ist nicht
+# thread-sicher, daher nutzt jeder Thread exklusiv eine ausgeliehene Instanz
+_API_POOL: "queue.SimpleQueue[PyTessBaseAPI]" = queue.SimpleQueue()
+
+# One OCR thread pool shared by all requests of this process, created on first
+# use. Its size caps the number of concurrently used (and thus created) APIs.
+_OCR_EXECUTOR: ThreadPoolExecutor | None = None
+_OCR_EXECUTOR_LOCK = threading.Lock()
+
+
+def _ocr_executor() -> ThreadPoolExecutor:
+    """
+    Liefert den prozessweiten OCR-Thread-Pool und erzeugt ihn beim ersten Aufruf.
+
+    Returns:
+        ThreadPoolExecutor: Pool mit OCR_MAX_WORKERS Threads
+    """
+    global _OCR_EXECUTOR
+    with _OCR_EXECUTOR_LOCK:
+        if _OCR_EXECUTOR is None:
+            _OCR_EXECUTOR = ThreadPoolExecutor(
+                max_workers=max(1, OCR_MAX_WORKERS), thread_name_prefix="tesseract"
+            )
+        return _OCR_EXECUTOR
+
+
+@contextmanager
+def _borrow_tess_api() -> Iterator["PyTessBaseAPI"]:
+    """
+    Leiht eine tesserocr-API-Instanz ('deu') exklusiv für den aktuellen Thread aus.
+
+    Freie Instanzen werden wiederverwendet; nur wenn alle belegt sind, wird
+    eine neue erzeugt. Damit entstehen höchstens so viele Instanzen wie
+    gleichzeitig OCR-Threads laufen, und das Modell bleibt geladen.
+
+    Yields:
+        PyTessBaseAPI: Exklusiv nutzbare API-Instanz
+    """
+    try:
+        api = _API_POOL.get_nowait()
+    except queue.Empty:
+        ocr_logger.info("Initialisiere tesserocr-API (lang='deu')")
+        api = PyTessBaseAPI(lang='deu', psm=PSM.AUTO)
+    try:
+        yield api
+    finally:
+        _API_POOL.put(api)
+
+
+def _otsu_threshold(gray: np.ndarray) -> int:
+    """
+    Berechnet den Otsu-Schwellenwert eines 8-Bit-Graustufenbildes.
+
+    Args:
+        gray (np.ndarray): Graustufenbild (uint8)
+
+    Returns:
+        int: Schwellenwert, der die Varianz zwischen den Klassen maximiert
+    """
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    weight_bg = np.cumsum(hist)
+    weight_fg = weight_bg[-1] - weight_bg
+    sum_bg = np.cumsum(hist * levels)
+    mean_bg = np.divide(sum_bg, weight_bg, out=np.zeros(256), where=weight_bg > 0)
+    mean_fg = np.divide(sum_bg[-1] - sum_bg, weight_fg, out=np.zeros(256), where=weight_fg > 0)
+    between_var = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between_var))
+
+
+def _binarize(gray: np.ndarray) -> Image.Image:
+    """
+    Binarisiert ein Graustufenbild mit Otsu.
+
+    Args:
+        gray (np.ndarray): Graustufenbild (uint8)
+
+    Returns:
+        Image.Image: Binarisiertes Schwarz-Weiß-Bild für Tesseract
+    """
+    threshold = _otsu_threshold(gray)
+    binary = np.where(gray > threshold, 255, 0).astype(np.uint8)
+    return Image.fromarray(binary)
+
+
+def _preprocess(png_path: str) -> Image.Image:
+    """
+    Lädt ein PNG als Graustufenbild und binarisiert es mit Otsu.
+
+    Args:
+        png_path (str): Pfad zur PNG-Bilddatei
+
+    Returns:
+        Image.Image: Binarisiertes Schwarz-Weiß-Bild für Tesseract
+    """
+    with Image.open(png_path) as img:
+        gray = np.asarray(img.convert("L"))
+    return _binarize(gray)
+
+
+def _recognize(image: Image.Image) -> str:
+    """
+    Erkennt Text in einem binarisierten Bild mit Tesseract.
+
+    Args:
+        image (Image.Image): Binarisiertes Bild
+
+    Returns:
+        str: Erkannter Text
+    """
+    if USE_TESSEROCR:
+        with _borrow_tess_api() as api:
+            api.SetImage(image)
+            return api.GetUTF8Text()
+    # Image via stdin, text via stdout: no temp files on either side
+    png_buffer = io.BytesIO()
+    image.save(png_buffer, format="PNG")
+    return subprocess.run(
+        [pytesseract.pytesseract.tesseract_cmd, "stdin", "stdout", "-l", "deu", "--psm", "3"],
+        input=png_buffer.getvalue(), capture_output=True, check=True
+    ).stdout.decode("utf-8")
+
+
 def tesseract_png_to_text(png_path: str) -> str:
     """
     Extrahiert Text aus einem PNG-Bild mittels Tesseract OCR.
@@ -34,14 +191,15 @@ def tesseract_png_to_text(png_path: str) -> str:
     Note:
         - Verwendet deutsche Spracherkennung ('deu')
         - PSM 3: Vollautomatische Seitensegmentierung ohne OSD
+        - Nutzt tesserocr (In-Process) wenn verfügbar, sonst die Tesseract-CLI
+          über stdin/stdout
+        - Das Bild wird vorab mit Otsu binarisiert
     """
-    # Use pytesseract to directly get the text, without relying on file system
-    ocr_logger.info(f"Processing image: {png_path}")
+    ocr_logger.info("Processing image: %s", png_path)
     
     try:
-        # Get text directly from pytesseract
-        raw_text = image_to_string(png_path, lang='deu', config='--psm 3')
-        ocr_logger.debug(f"Extracted {len(raw_text)} characters with Tesseract")
+        raw_text = _recognize(_preprocess(png_path))
+        ocr_logger.debug("Extracted %d characters with Tesseract", len(raw_text))
         return raw_text
             
     except Exception as e:
@@ -49,6 +207,127 @@ def tesseract_png_to_text(png_path: str) -> str:
         raise
 
 
+def tesseract_gray_to_text(gray: np.ndarray) -> str:
+    """
+    Extrahiert Text aus einem Graustufenbild im Speicher mittels Tesseract OCR.
+
+    Args:
+        gray (np.ndarray): Graustufenbild (uint8), z.B. aus
+                           pdf_to_gray_arrays_with_pymupdf
+
+    Returns:
+        str: Erkannter Text als String
+    """
+    raw_text = _recognize(_binarize(gray))
+    ocr_logger.debug("Extracted %d characters with Tesseract", len(raw_text))
+    return raw_text
+
+
+def tesseract_arrays_to_text(pages: Iterable[np.ndarray]) -> List[str]:
+    """
+    Extrahiert Text aus Graustufen-Seiten, während diese noch gerendert werden.
+
+    Jede Seite wird beim Eintreffen an den prozessweiten Thread-Pool
+    (OCR_MAX_WORKERS Threads, von allen Anfragen geteilt) übergeben;
+    tesserocr gibt während der Erkennung den GIL frei, sodass das Rendern der
+    Folgeseiten parallel weiterläuft. Innerhalb eines Daemon-Prozesses (z.B.
+    Benchmark-Pool) wird sequentiell verarbeitet, da dort bereits ein Prozess
+    pro Kern läuft.
+
+    Args:
+        pages (Iterable[np.ndarray]): Graustufenbilder in Seitenreihenfolge
+
+    Returns:
+        List[str]: Erkannter Text pro Seite
+    """
+    # Outer worker pools already occupy the cores; one API ('deu' model) per process there
+    if multiprocessing.current_process().daemon:
+        return [tesseract_gray_to_text(gray) for gray in pages]
+    executor = _ocr_executor()
+    futures = [executor.submit(tesseract_gray_to_text, gray) for gray in pages]
+    return [future.result() for future in futures]
+
+
+def _split_batch_output(stdout: str, page_count: int) -> List[str]:
+    """
+    Teilt die Ausgabe eines Tesseract-Batch-Laufs in Seitentexte auf.
+
+    Tesseract 5 schreibt den Form-Feed-Trenner nur zwischen die Seiten,
+    ältere Versionen zusätzlich nach der letzten Seite. Ein leeres letztes
+    Element wird daher nur verworfen, wenn es über die Seitenzahl hinausgeht;
+    eine leere letzte Seite (z.B. leere Rückseite) bleibt erhalten.
+
+    Args:
+        stdout (str): Textausgabe des Tesseract-Laufs
+        page_count (int): Anzahl der übergebenen Seiten
+
+    Returns:
+        List[str]: Text pro Seite (bei unerwarteter Ausgabe ggf. mit
+                   abweichender Länge)
+    """
+    page_texts = stdout.split("\f")
+    if len(page_texts) == page_count + 1 and not page_texts[-1].strip():
+        page_texts.pop()
+    return page_texts
+
+
+def tesseract_pngs_to_text(png_paths: List[str]) -> List[str]:
+    """
+    Extrahiert Text aus mehreren PNG-Seiten mit einem einzigen Tesseract-Lauf.
+
+    Ohne tesserocr würde jede Seite einen eigenen Tesseract-Prozess starten
+    und das 'deu'-Modell neu laden. Stattdessen werden die binarisierten
+    Seiten in eine Listendatei geschrieben und in einem Prozess erkannt;
+    die Seiten werden anhand des Form-Feed-Trenners wieder aufgeteilt.
+    Mit tesserocr wird stattdessen tesseract_arrays_to_text verwendet.
+
+    Args:
+        png_paths (List[str]): Pfade zu den PNG-Bilddateien in Seitenreihenfolge
+
+    Returns:
+        List[str]: Erkannter Text pro Seite
+
+    Raises:
+        Exception: Bei Tesseract-Fehlern oder ungültigen Bildpfaden
+    """
+    if len(png_paths) <= 1:
+        return [tesseract_png_to_text(png_path) for png_path in png_paths]
+
+    ocr_logger.info("Processing %d images in one Tesseract run", len(png_paths))
+    binarized_paths = []
+    list_path = None
+    try:
+        for png_path in png_paths:
+            binarized_path = f"{os.path.splitext(png_path)[0]}_bin.png"
+            _preprocess(png_path).save(binarized_path)
+            binarized_paths.append(binarized_path)
+
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as list_file:
+            list_file.write("\n".join(binarized_paths))
+            list_path = list_file.name
+
+        result = subprocess.run(
+            [pytesseract.pytesseract.tesseract_cmd, list_path, "stdout", "-l", "deu", "--psm", "3"],
+            capture_output=True, text=True, encoding="utf-8", check=True
+        )
+    except Exception as e:
+        ocr_logger.exception(f"Error processing {len(png_paths)} images with Tesseract batch: {e}")
+        raise
+    finally:
+        for path in [*binarized_paths, list_path]:
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    page_texts = _split_batch_output(result.stdout, len(png_paths))
+    if len(page_texts) != len(png_paths):
+        ocr_logger.warning(
+            "Tesseract batch returned %d pages for %d images; falling back to per-page OCR",
+            len(page_texts), len(png_paths)
+        )
+        return [tesseract_png_to_text(png_path) for png_path in png_paths]
+    return page_texts
+
+
 if __name__ == "__main__":
     from app.config import SAMPLE_PNG_PATH
     """Testmodus: Verarbeitet das Beispiel-PNG mit Tesseract."""
@@ -60,4 +339,4 @@ if __name__ == "__main__":
         except Exception as e:
             ocr_logger.error(f"Tesseract-Test fehlgeschlagen: {e}")
     else:
-        ocr_logger.error("SAMPLE_PNG_PATH nicht konfiguriert")
\ No newline at end of file
+        ocr_logger.error("SAMPLE_PNG_PATH nicht konfiguriert")
@@ -16,9 +16,10 @@ Institution: Hochschule für Technik und Wirtschaft Berlin
 
 from __future__ import annotations
 
+import logging
 import os
 import time
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 
 from app.ocr.ocr_manager import ocr_pdf
 from app.post_processing import finalize_extracted_fields, verify_and_correct_fields
@@ -27,6 +28,27 @@ from app.semantic_extraction import ollama_extract_invoice_fields
 from app.logging_config import pipeline_logger
 
 
+def _text_preview(text_parts: List[str], limit: int = 200) -> str:
+    """
+    Baut eine gekürzte Textvorschau, ohne den gesamten Text zusammenzufügen.
+
+    Args:
+        text_parts (List[str]): Textinhalte pro Seite
+        limit (int, optional): Maximale Länge der Vorschau. Defaults to 200.
+
+    Returns:
+        str: Die ersten `limit` Zeichen der mit Leerzeichen verbundenen Seiten
+    """
+    preview_parts = []
+    total = 0
+    for part in text_parts:
+        preview_parts.append(part)
+        total += len(part) + 1
+        if total >= limit:
+            break
+    return ' '.join(preview_parts)[:limit]
+
+
 def process_invoice(pdf_path: str, *, engine: str = "paddleocr") -> Tuple[Dict, float, float]:
     """
 s    Führt die vollständige IDP-Pipeline für eine Rechnung durch.
@@ -72,7 +94,8 @@ s    Führt die vollständige IDP-Pipeline für eine Rechnung durch.
         raise ValueError("No text content was extracted from the PDF.")
         
     pipeline_logger.info(f"Extracted {len(final_text_parts)} pages of text content")
-    pipeline_logger.info(f"Gekürzte Vorschau des Textes: '{(' '.join(final_text_parts))[:200]}...'")
+    if pipeline_logger.isEnabledFor(logging.INFO):
+        pipeline_logger.info("Gekürzte Vorschau des Textes: '%s...'", _text_preview(final_text_parts))
 
     # Extract fields using LLM without bbox
     llm_output, ollama_duration = ollama_extract_invoice_fields(final_text_parts)
@@ -18,8 +18,11 @@ Institution: Hochschule für Technik und Wirtschaft Berlin
 """
 
 import re
-from datetime import datetime
-from typing import Dict, Any, List
+from calendar import monthrange
+from datetime import date
+from functools import lru_cache
+from operator import attrgetter
+from typing import Dict, Any
 
 from app.logging_config import postprocessing_logger
 
@@ -29,18 +32,111 @@ from app.logging_config import postprocessing_logger
 # --- Rule-Based Verification and Correction ---
 # =============================================================================
 
-UST_ID_PATTERNS: List[re.Pattern] = [
-    re.compile(r'\b(DE[0-9]{9})\b', re.IGNORECASE),
-    re.compile(r'\b(ATU[0-9]{8})\b', re.IGNORECASE),
-    re.compile(r'\b(DE[0-9]{8})\b', re.IGNORECASE),
-]
+# Single alternation so the text is scanned only once. Each format has its
+# own group; the group number is the format's priority (DE9 < ATU < DE8).
+# Both patterns run on the upper-cased text, hence no re.IGNORECASE.
+UST_ID_PATTERN: re.Pattern = re.compile(
+    r'\b(?:(DE[0-9]{9})|(ATU[0-9]{8})|(DE[0-9]{8}))\b'
+)
+
+# A single, complete USt-Id as extracted by the LLM
+UST_ID_EXACT_PATTERN: re.Pattern = re.compile(r'DE[0-9]{9}|ATU[0-9]{8}|DE[0-9]{8}')
 
 # KORREKTUR: More precise IBAN pattern to avoid false matches
 IBAN_PATTERN: re.Pattern = re.compile(
-    r'\b([A-Z]{2}[O0]?\d{2}(?:\s*[A-Z0-9O]){11,28})\b',
-    re.IGNORECASE
+    r'\b([A-Z]{2}[O0]?\d{2}(?:\s*[A-Z0-9O]){11,28})\b'
 )
 
+# IBAN length per country (ISO 13616 / SWIFT IBAN registry)
+IBAN_LENGTHS: Dict[str, int] = {
+    'AD': 24, 'AE': 23, 'AL': 28, 'AT': 20, 'AZ': 28, 'BA': 20, 'BE': 16, 'BG': 22,
+    'BH': 22, 'BR': 29, 'BY': 28, 'CH': 21, 'CR': 22, 'CY': 28, 'CZ': 24, 'DE': 22,
+    'DK': 18, 'DO': 28, 'EE': 20, 'EG': 29, 'ES': 24, 'FI': 18, 'FO': 18, 'FR': 27,
+    'GB': 22, 'GE': 22, 'GI': 23, 'GL': 18, 'GR': 27, 'GT': 28, 'HR': 21, 'HU': 28,
+    'IE': 22, 'IL': 23, 'IQ': 23, 'IS': 26, 'IT': 27, 'JO': 30, 'KW': 30, 'KZ': 20,
+    'LB': 28, 'LC': 32, 'LI': 21, 'LT': 20, 'LU': 20, 'LV': 21, 'MC': 27, 'MD': 24,
+    'ME': 22, 'MK': 19, 'MR': 27, 'MT': 31, 'MU': 30, 'NL': 18, 'NO': 15, 'PK': 24,
+    'PL': 28, 'PS': 29, 'PT': 25, 'QA': 29, 'RO': 24, 'RS': 22, 'SA': 24, 'SC': 31,
+    'SE': 24, 'SI': 19, 'SK': 24, 'SM': 27, 'ST': 25, 'SV': 28, 'TL': 23, 'TN': 24,
+    'TR': 26, 'UA': 29, 'VA': 22, 'VG': 24, 'XK': 20,
+}
+
+# Every whitespace char matched by \s (all Unicode whitespace lies below U+3001)
+_WHITESPACE_DELETE = {chr(c): None for c in range(0x3001) if chr(c).isspace()}
+
+# O→0 and whitespace removal for LLM-extracted IBANs and regex candidates in a single pass
+_IBAN_FIX = str.maketrans({'O': '0', 'o': '0', **_WHITESPACE_DELETE})
+
+# Letters expand to two digits for the MOD-97 check: A=10 … Z=35
+_IBAN_LETTER_DIGITS = str.maketrans({chr(ord('A') + i): str(10 + i) for i in range(26)})
+
+@lru_cache(maxsize=1024)
+def _validate_iban(iban: str) -> bool:
+    """
+    Prüft eine normalisierte IBAN mit der MOD-97-Prüfsumme (ISO 13616).
+
+    Die umgestellte IBAN wird per str.translate in eine Ziffernfolge
+    übersetzt (A=10 … Z=35) und anschließend modulo 97 geprüft.
+    Ergebnisse werden gecacht, da dieselbe IBAN oft mehrfach im Text steht.
+
+    Args:
+        iban (str): IBAN in Großbuchstaben ohne Leerzeichen
+
+    Returns:
+        bool: True wenn die Prüfsumme gültig ist
+    """
+    if len(iban) < 15 or not iban.isascii() or not iban.isalnum():
+        return False
+    numeric_iban = (iban[4:] + iban[:4]).translate(_IBAN_LETTER_DIGITS)
+    # Lower-case letters survive the translation and are rejected here
+    if not numeric_iban.isdigit():
+        return False
+    return int(numeric_iban) % 97 == 1
+
+def _iban_from_candidate(candidate: str) -> str | None:
+    """
+    Ermittelt aus einem normalisierten Regex-Treffer eine gültige IBAN.
+
+    Bei bekanntem Länderkürzel wird der Treffer auf die Länge des Landes
+    gekürzt, da das Pattern oft nachfolgenden Text (z.B. 'BIC') mit erfasst.
+    Unbekannte Länder werden nur über Länge und Prüfsumme validiert.
+
+    Args:
+        candidate (str): Treffer in Großbuchstaben ohne Leerzeichen
+
+    Returns:
+        str | None: Gültige IBAN oder None
+    """
+    country_length = IBAN_LENGTHS.get(candidate[:2])
+    if country_length is not None:
+        if len(candidate) >= country_length and _validate_iban(candidate[:country_length]):
+            return candidate[:country_length]
+        return None
+    if 15 <= len(candidate) <= 32 and candidate[:2].isalpha() and _validate_iban(candidate):
+        return candidate
+    return None
+
+def _contains_word(text: str, token: str) -> bool:
+    """
+    Prüft, ob ein Wort mit Wortgrenzen (wie \\b im Regex) im Text vorkommt.
+
+    Args:
+        text (str): Zu durchsuchender Text
+        token (str): Gesuchtes Wort
+
+    Returns:
+        bool: True bei mindestens einem Vorkommen mit Wortgrenzen
+    """
+    start = text.find(token)
+    while start != -1:
+        end = start + len(token)
+        before = text[start - 1] if start else ' '
+        after = text[end] if end < len(text) else ' '
+        if not (before.isalnum() or before == '_') and not (after.isalnum() or after == '_'):
+            return True
+        start = text.find(token, start + 1)
+    return False
+
 def verify_and_correct_fields(data: Dict[str, Any], full_text: str) -> Dict[str, Any]:
     """
     Verifiziert und korrigiert extrahierte Felder mittels Regex-Patterns.
@@ -57,7 +153,8 @@ def verify_and_correct_fields(data: Dict[str, Any], full_text: str) -> Dict[str,
         Dict[str, Any]: Korrigierte und verifizierte Daten
         
     Korrekturen:
-        - IBAN: O→0 Korrektur, Leerzeichen-Entfernung, Prefix-Bereinigung
+        - IBAN: O→0 Korrektur, Leerzeichen-Entfernung, Prefix-Bereinigung,
+          MOD-97-Prüfung bei der Nachsuche im Volltext
         - USt-ID: Pattern-Erkennung für DE/ATU-Formate
         - Automatische Nachsuche bei fehlenden kritischen Feldern
         
@@ -71,6 +168,8 @@ def verify_and_correct_fields(data: Dict[str, Any], full_text: str) -> Dict[str,
     # get iban and ust-id from data
     iban = (data.get('iban') or '').strip()
     ust_id = (data.get('ust-id') or '').strip()
+    # Upper-case once; the patterns and all candidates work on this copy
+    full_text_upper = full_text.upper()
 
     # --- Verify and Correct IBAN ---
     # Clean IBAN from common prefixes
@@ -80,60 +179,62 @@ def verify_and_correct_fields(data: Dict[str, Any], full_text: str) -> Dict[str,
             iban = iban[5:].strip()
             data['iban'] = iban
         
-        # Fix O->0 and normalize spaces in LLM output
-        if 'O' in iban or 'o' in iban or ' ' in iban:
-            corrected_iban = iban.replace('O', '0').replace('o', '0').replace(' ', '')
+        # Fix O->0 and normalize whitespace (incl. tabs/NBSP) in LLM output
+        corrected_iban = iban.translate(_IBAN_FIX)
+        if corrected_iban != iban:
             data['iban'] = corrected_iban
-            postprocessing_logger.info(f"Fixed IBAN OCR error from '{iban}' to '{corrected_iban}'.")
+            postprocessing_logger.info("Fixed IBAN OCR error from '%s' to '%s'.", iban, corrected_iban)
     
     if not iban:
         # Only search for IBAN if LLM found nothing
-        all_iban_matches = IBAN_PATTERN.findall(full_text)
-        valid_ibans = []
-        for match in all_iban_matches:
-            clean_iban = re.sub(r'\s+', '', match.upper()).replace('O', '0')
-            # Validate typical IBAN length and format
-            if 15 <= len(clean_iban) <= 32 and clean_iban[:2].isalpha():
-                valid_ibans.append(clean_iban)
+        candidates = [match.translate(_IBAN_FIX) for match in IBAN_PATTERN.findall(full_text_upper)]
+        # Take last/most relevant: walk backwards and stop at the first candidate
+        # with the country's IBAN length and a valid MOD-97 checksum
+        found_iban = None
+        for iban_candidate in reversed(candidates):
+            found_iban = _iban_from_candidate(iban_candidate)
+            if found_iban:
+                break
         
-        if valid_ibans:
-            data['iban'] = valid_ibans[-1]  # Take last/most relevant
-            postprocessing_logger.info(f"Found IBAN '{valid_ibans[-1]}'.")
+        if found_iban:
+            data['iban'] = found_iban
+            postprocessing_logger.info("Found IBAN '%s'.", found_iban)
         else:
             postprocessing_logger.info("No valid IBAN found in text.")
     else:
-        postprocessing_logger.info(f"IBAN '{iban}' kept as extracted by LLM.")
+        postprocessing_logger.info("IBAN '%s' kept as extracted by LLM.", iban)
 
     # --- Verify and Correct USt-Id ---
-    # Find all USt-Id matches in the full text
-    all_ust_ids = []
-    for pattern in UST_ID_PATTERNS:
-        matches = pattern.findall(full_text)
-        all_ust_ids.extend([match.upper() for match in matches])
-    
-    # Remove duplicates while preserving order
-    seen = set()
-    unique_ust_ids = []
-    for ust in all_ust_ids:
-        if ust not in seen:
-            seen.add(ust)
-            unique_ust_ids.append(ust)
+    # Fast path: a well-formed USt-Id from the LLM that occurs in the text is kept
+    # without scanning for all USt-Ids (same outcome as the full scan below)
+    if ust_id and UST_ID_EXACT_PATTERN.fullmatch(ust_id) and _contains_word(full_text_upper, ust_id):
+        postprocessing_logger.info("USt-Id '%s' is valid and found in text.", ust_id)
+        return data
+
+    # Find all USt-Id matches in the full text, ordered by format priority and
+    # then text position, and remove duplicates while preserving that order
+    matches = sorted(UST_ID_PATTERN.finditer(full_text_upper), key=attrgetter('lastindex'))
+    unique_ust_ids = list(dict.fromkeys(match.group(match.lastindex) for match in matches))
     
     if unique_ust_ids:
         # If current USt-Id exists and is in the list of found USt-Ids, keep it
         if ust_id and ust_id in unique_ust_ids:
-            postprocessing_logger.info(f"USt-Id '{ust_id}' is valid and found in text.")
+            postprocessing_logger.info("USt-Id '%s' is valid and found in text.", ust_id)
         else:
             # Use the last found USt-Id as the most relevant one
             corrected_ust_id = unique_ust_ids[-1]
             if data.get('ust-id') != corrected_ust_id:
-                postprocessing_logger.info(f"Corrected USt-Id from '{ust_id}' to '{corrected_ust_id}' (last found in text).")
+                postprocessing_logger.info("Corrected USt-Id from '%s' to '%s' (last found in text).", ust_id, corrected_ust_id)
             data['ust-id'] = corrected_ust_id
     else:
-        postprocessing_logger.info(f"No valid USt-Id found in text. Current USt-Id: '{ust_id}'")
+        postprocessing_logger.info("No valid USt-Id found in text. Current USt-Id: '%s'", ust_id)
 
     return data
 
+# Strip apostrophes, (non-breaking) spaces and € and turn the decimal comma into a point in one pass
+_NUMBER_TRANS = str.maketrans({"'": None, " ": None, "\u00a0": None, "€": None, ",": "."})
+
+
 def canon_number(x: str | float | None) -> float | None:
     """
     Kanonisiert einen Zahlenwert zu einem Float.
@@ -154,15 +255,23 @@ def canon_number(x: str | float | None) -> float | None:
         - Konvertiert Komma zu Punkt als Dezimaltrennzeichen
         - Rundet auf 2 Dezimalstellen für Geldbeträge
     """
-    if x in (None, "", "null"): return None
+    # Numeric values (the usual LLM output) skip the sentinel comparisons
     if isinstance(x, (int, float)): return round(float(x), 2)
-    x = str(x).replace("'", "").replace(" ", "").replace("€", "").replace(",", ".")
+    if x is None or x == "" or x == "null": return None
+    x = str(x).translate(_NUMBER_TRANS)
     try:
         return round(float(x), 2)
     except ValueError:
         return None
 
 
+# Day-first (DD.MM.YYYY, DD/MM/YYYY) or year-first (YYYY-MM-DD, YYYY/MM/DD, YYYY.MM.DD)
+_DATE_RE: re.Pattern = re.compile(
+    r'(?P<d1>[0-9]{1,2})(?P<s1>[./])(?P<m1>[0-9]{1,2})(?P=s1)(?P<y1>[0-9]{4})'
+    r'|(?P<y2>[0-9]{4})(?P<s2>[-/.])(?P<m2>[0-9]{1,2})(?P=s2)(?P<d2>[0-9]{1,2})'
+)
+
+
 def canon_date(date_str: str) -> str | None:
     """
     Kanonisiert einen Datumsstring zum Format 'DD.MM.YYYY'.
@@ -186,13 +295,32 @@ def canon_date(date_str: str) -> str | None:
     if not date_str:
         return None
     date_str = date_str.strip()
-    # Try to parse common date formats including YYYY.MM.DD
-    for fmt in ("%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d", "%Y.%m.%d"):
+    # Fast path for ISO dates (YYYY-MM-DD), the usual LLM output; parsed in C
+    if len(date_str) == 10 and date_str[4] == '-' and date_str[7] == '-':
         try:
-            return datetime.strptime(date_str, fmt).strftime("%d.%m.%Y")
+            parsed = date.fromisoformat(date_str)
+            return f"{parsed.day:02d}.{parsed.month:02d}.{parsed.year:04d}"
         except ValueError:
-            continue
-    return None  # If no format matched, return None
+            pass
+    # One regex match picks the field order; no strptime/ValueError round trips
+    match = _DATE_RE.fullmatch(date_str)
+    if match is None:
+        return None  # If no format matched, return None
+    if match['y1'] is not None:
+        year, month, day = int(match['y1']), int(match['m1']), int(match['d1'])
+    else:
+        year, month, day = int(match['y2']), int(match['m2']), int(match['d2'])
+    if year < 1 or not 1 <= month <= 12 or not 1 <= day <= monthrange(year, month)[1]:
+        return None
+    return f"{day:02d}.{month:02d}.{year:04d}"
+
+
+_NUMBER_FIELDS = ('total_amount', 'tax_rate')
+_DATE_FIELDS = ('invoice_date',)
+
+_DIGIT_RE: re.Pattern = re.compile(r'\d')
+_REPRESENTED_BY_RE: re.Pattern = re.compile(r'vertr\. d\.|vertreten durch')
+_PO_DESCRIPTIVE_WORDS = ('erteilt', 'am:', 'datum')
 
 
 def finalize_extracted_fields(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -221,24 +349,26 @@ def finalize_extracted_fields(data: Dict[str, Any]) -> Dict[str, Any]:
     if not isinstance(data, dict):
         return data
 
-    if 'total_amount' in data:
-        data['total_amount'] = canon_number(data['total_amount'])
+    # canon_number already returns floats rounded to 2 decimal places
+    for key in _NUMBER_FIELDS:
+        if key in data:
+            data[key] = canon_number(data[key])
 
-    if 'tax_rate' in data:
-        data['tax_rate'] = canon_number(data['tax_rate'])
-        # Ensure tax_rate has exactly 2 decimal places
-        if data['tax_rate'] is not None:
-            data['tax_rate'] = round(float(data['tax_rate']), 2)
-
-    if 'invoice_date' in data:
-        data['invoice_date'] = canon_date(data['invoice_date'])
+    for key in _DATE_FIELDS:
+        if key in data:
+            data[key] = canon_date(data[key])
     
     # Clean up purchase_order_number - only remove if it's clearly descriptive text
     if 'purchase_order_number' in data and data['purchase_order_number']:
         po = data['purchase_order_number'].strip()
         # Only remove if contains descriptive words (not just dates/numbers)
-        if any(word in po.lower() for word in ['erteilt', 'am:', 'datum']) and len(po) > 15:
-            postprocessing_logger.info(f"Cleaned invalid purchase order '{po}' → null")
+        if len(po) > 15:
+            po_lower = po.lower()
+            is_descriptive = any(word in po_lower for word in _PO_DESCRIPTIVE_WORDS)
+        else:
+            is_descriptive = False
+        if is_descriptive:
+            postprocessing_logger.info("Cleaned invalid purchase order '%s' → null", po)
             data['purchase_order_number'] = None
     
     # Clean up recipient_name - remove addresses and limit length
@@ -248,13 +378,13 @@ def finalize_extracted_fields(data: Dict[str, Any]) -> Dict[str, Any]:
         if ' - ' in name:
             parts = name.split(' - ')
             # Check if second part looks like address (contains numbers or "str")
-            if len(parts) > 1 and (any(char.isdigit() for char in parts[1]) or 'str' in parts[1].lower()):
+            if len(parts) > 1 and (_DIGIT_RE.search(parts[1]) or 'str' in parts[1].lower()):
                 name = parts[0].strip()
-                postprocessing_logger.info(f"Removed address after dash from recipient → '{name}'")
+                postprocessing_logger.info("Removed address after dash from recipient → '%s'", name)
         # Remove everything after comma if it looks like an address
-        elif ',' in name and any(char.isdigit() for char in name.split(',')[-1]):
-            name = name.split(',')[0].strip()
-            postprocessing_logger.info(f"Removed address from recipient name → '{name}'")
+        elif ',' in name and _DIGIT_RE.search(name.rpartition(',')[2]):
+            name = name.partition(',')[0].strip()
+            postprocessing_logger.info("Removed address from recipient name → '%s'", name)
         # Limit to 80 characters
         if len(name) > 80:
             name = name[:80].strip()
@@ -265,14 +395,14 @@ def finalize_extracted_fields(data: Dict[str, Any]) -> Dict[str, Any]:
     if 'vendor_name' in data and data['vendor_name']:
         name = data['vendor_name'].strip()
         # Remove "vertr. d." or "vertreten durch" phrases
-        if 'vertr. d.' in name or 'vertreten durch' in name:
+        if match := _REPRESENTED_BY_RE.search(name):
             # Extract only the first company name
-            name = name.split('vertr. d.')[0].split('vertreten durch')[0].strip()
-            postprocessing_logger.info(f"Cleaned vendor name to '{name}'")
+            name = name[:match.start()].strip()
+            postprocessing_logger.info("Cleaned vendor name to '%s'", name)
         # Remove everything after comma if it looks like an address
-        elif ',' in name and any(char.isdigit() for char in name.split(',')[-1]):
-            name = name.split(',')[0].strip()
-            postprocessing_logger.info(f"Removed address from vendor name → '{name}'")
+        elif ',' in name and _DIGIT_RE.search(name.rpartition(',')[2]):
+            name = name.partition(',')[0].strip()
+            postprocessing_logger.info("Removed address from vendor name → '%s'", name)
         data['vendor_name'] = name
 
     return data
\ No newline at end of file
@@ -14,18 +14,28 @@ Projekt: Konzeption und prototypische Implementierung einer KI-basierten und
 Institution: Hochschule für Technik und Wirtschaft Berlin
 """
 
+import hashlib
 import json
+import os
 import re
+import tempfile
+import threading
 import time
-import warnings
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Tuple
 
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # --- Configuration for prompt files ---
 from app.config import (
     CHAT_ENDPOINT,
+    LLM_CACHE_DIR,
+    LLM_CACHE_TTL_SECONDS,
+    OLLAMA_CONCURRENCY,
     OLLAMA_MODEL,
     SYSTEM_PROMPT_FILE,
     USER_PROMPT_FILE,
@@ -34,6 +44,200 @@ from app.config import (
 )
 from app.logging_config import semantic_logger
 
+# Precompiled patterns for parsing the LLM answer
+_JSON_OUTPUT_TAG_RE: re.Pattern = re.compile(r'<json_output>(.*?)</json_output>', re.DOTALL)
+_JSON_DECODER = json.JSONDecoder()
+# Complete string literal, brace, or a lone quote that opens an unterminated string
+_JSON_SCAN_RE: re.Pattern = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}"]', re.DOTALL)
+
+# One keep-alive connection pool for all Ollama calls of this process
+_SESSION = requests.Session()
+_SESSION.verify = False
+# Local Ollama instances often use self-signed certificates; silence this once
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# Pool sized to the concurrency gate; only failed connects are retried (POST is not idempotent)
+_ADAPTER = HTTPAdapter(
+    pool_maxsize=max(1, OLLAMA_CONCURRENCY),
+    max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.5),
+)
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+# Caps in-flight requests from this process (API server threads)
+_OLLAMA_SLOTS = threading.BoundedSemaphore(max(1, OLLAMA_CONCURRENCY))
+
+# Wraps each page's OCR text in its own user message
+_PAGE_TEMPLATE = "Here is the text for Page {page} of {num_pages}:\n\n---\n{text}\n---"
+
+
+@lru_cache(maxsize=8)
+def _read_prompt(path: str) -> str:
+    """
+    Liest eine Prompt-Datei einmal pro Prozess und hält sie im Speicher.
+
+    Args:
+        path (str): Pfad zur Prompt-Datei
+
+    Returns:
+        str: Inhalt der Prompt-Datei
+
+    Raises:
+        FileNotFoundError: Wenn die Datei nicht existiert (wird nicht gecacht)
+    """
+    return Path(path).read_text(encoding="utf-8")
+
+
+def _page_messages(ocr_pages: List[str]) -> List[Dict[str, str]]:
+    """
+    Erzeugt je Seite eine User-Nachricht mit dem OCR-Text.
+
+    Args:
+        ocr_pages (List[str]): OCR-Text pro Seite
+
+    Returns:
+        List[Dict[str, str]]: Chat-Nachrichten in Seitenreihenfolge
+    """
+    num_pages = len(ocr_pages)
+    return [
+        {"role": "user", "content": _PAGE_TEMPLATE.format(page=i, num_pages=num_pages, text=page_text)}
+        for i, page_text in enumerate(ocr_pages, start=1)
+    ]
+
+
+def _llm_cache_path(messages: List[Dict[str, str]]) -> Path | None:
+    """
+    Ermittelt den Cache-Pfad für eine Nachrichtenliste.
+
+    Der Schlüssel ist ein SHA-256-Hash über Modellname und alle Nachrichten
+    (Prompts und OCR-Text), sodass geänderte Prompts den Cache umgehen.
+
+    Args:
+        messages (List[Dict[str, str]]): Chat-Nachrichten für Ollama
+
+    Returns:
+        Path | None: Pfad zur Cache-Datei oder None, wenn der Cache nicht
+                     über IDP_LLM_CACHE=1 aktiviert ist
+    """
+    if os.getenv("IDP_LLM_CACHE") != "1":
+        return None
+    payload = json.dumps([OLLAMA_MODEL, messages], ensure_ascii=False)
+    key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return Path(LLM_CACHE_DIR) / f"{key}.json"
+
+
+def _read_llm_cache(cache_path: Path) -> Dict | None:
+    """
+    Liest einen Cache-Eintrag, sofern er existiert und nicht abgelaufen ist.
+
+    Abgelaufene Einträge werden gelöscht.
+
+    Args:
+        cache_path (Path): Pfad zur Cache-Datei
+
+    Returns:
+        Dict | None: Gecachtes Extraktionsergebnis oder None
+    """
+    try:
+        if time.time() - cache_path.stat().st_mtime > LLM_CACHE_TTL_SECONDS:
+            cache_path.unlink(missing_ok=True)
+            return None
+        return json.loads(cache_path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as e:
+        semantic_logger.warning(f"LLM-Cache-Eintrag unlesbar, wird ignoriert: {e}")
+        return None
+
+
+def _write_llm_cache(cache_path: Path, extracted_fields: Dict) -> None:
+    """
+    Schreibt einen Cache-Eintrag atomar und entfernt abgelaufene Einträge.
+
+    Der Eintrag wird zunächst in eine temporäre Datei im Cache-Verzeichnis
+    geschrieben und dann per os.replace umbenannt, sodass parallele Leser
+    nie eine halb geschriebene Datei sehen.
+
+    Args:
+        cache_path (Path): Pfad zur Cache-Datei
+        extracted_fields (Dict): Zu cachendes Extraktionsergebnis
+    """
+    cache_dir = cache_path.parent
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=cache_dir, suffix=".tmp", delete=False, encoding="utf-8") as tmp:
+            json.dump(extracted_fields, tmp, ensure_ascii=False)
+        os.replace(tmp.name, cache_path)
+    except OSError as e:
+        semantic_logger.warning(f"LLM-Ergebnis konnte nicht gecacht werden: {e}")
+        return
+
+    # Bound the cache: drop expired entries (and leftover temp files)
+    expiry = time.time() - LLM_CACHE_TTL_SECONDS
+    for entry in os.scandir(cache_dir):
+        try:
+            if entry.stat().st_mtime < expiry:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def _stream_chat(body: Dict, stop_after_json: bool = False) -> str:
+    """
+    Streamt eine Ollama-Chat-Antwort und setzt den Inhalt zusammen.
+
+    Ollama liefert beim Streaming eine Zeile JSON pro Token-Gruppe, sodass
+    der Server die Antwort nicht erst vollständig puffern muss. Mit
+    stop_after_json wird die Verbindung geschlossen, sobald das erste
+    JSON-Objekt (bzw. der <json_output>-Block) abgeschlossen ist, sodass
+    das Modell keinen nachfolgenden Erklärungstext mehr generiert.
+
+    Args:
+        body (Dict): Request-Body für den Chat-Endpoint (mit "stream": True)
+        stop_after_json (bool): Nach dem ersten vollständigen JSON abbrechen
+
+    Returns:
+        str: Bis dahin empfangener Inhalt der Assistenten-Nachricht
+
+    Raises:
+        RuntimeError: Bei HTTP-Fehlern oder Fehlermeldungen im Stream
+        ValueError: Wenn eine Stream-Zeile nicht im erwarteten Format ist
+    """
+    parts: List[str] = []
+    with _OLLAMA_SLOTS, _SESSION.post(CHAT_ENDPOINT, json=body, timeout=600, stream=True) as resp:
+        if resp.status_code != 200:
+            raise RuntimeError(f"Ollama API Error: {resp.status_code} – {resp.text}")
+
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            try:
+                chunk = json.loads(line)
+                piece = chunk.get("message", {}).get("content", "")
+            except (AttributeError, json.JSONDecodeError):
+                raise ValueError("Ollama chat response is not in the expected format.")
+            if "error" in chunk:
+                raise RuntimeError(f"Ollama API Error: {chunk['error']}")
+            parts.append(piece)
+            if chunk.get("done"):
+                # The final line carries Ollama's generation statistics
+                eval_count = chunk.get("eval_count")
+                eval_duration = chunk.get("eval_duration")
+                if eval_count and eval_duration:
+                    semantic_logger.debug(
+                        "Ollama: %d Tokens in %.2fs (%.1f Tokens/s)",
+                        eval_count, eval_duration / 1e9, eval_count / (eval_duration / 1e9)
+                    )
+                break
+            # Only a closing brace or tag can complete the JSON; check then
+            if stop_after_json and ("}" in piece or ">" in piece):
+                content = "".join(parts)
+                if "<json_output>" in content:
+                    if "</json_output>" in content:
+                        break
+                elif _extract_first_complete_json(content):
+                    break
+    return "".join(parts)
+
 
 def ollama_extract_invoice_fields(ocr_pages: List[str]) -> Tuple[Dict, float]:
     """
@@ -65,69 +269,76 @@ def ollama_extract_invoice_fields(ocr_pages: List[str]) -> Tuple[Dict, float]:
     Note:
         Erfordert eine laufende Ollama-Instanz und konfigurierte Prompt-Dateien.
         Die Funktion unterdrückt SSL-Warnungen für lokale Ollama-Instanzen.
+        Die Antwort wird gestreamt und abgebrochen, sobald das JSON-Objekt
+        vollständig ist; die LLM-Dauer umfasst nur diesen Teil.
+        Mit IDP_LLM_CACHE=1 werden Ergebnisse anhand eines Hashes der Eingabe
+        auf der Festplatte gecacht (Gültigkeit IDP_LLM_CACHE_TTL_HOURS); ein
+        Cache-Treffer liefert eine LLM-Dauer von 0.0 Sekunden.
+        Enthalten alle Seiten nur Leerzeichen, wird ohne LLM-Aufruf ein
+        leeres Dict zurückgegeben.
     """
     # Load standard prompts for regular text extraction
     try:
         if SYSTEM_PROMPT_FILE is None or USER_PROMPT_FILE is None:
             raise FileNotFoundError("Required prompt files are not set in environment variables.")
         
-        system_prompt = Path(SYSTEM_PROMPT_FILE).read_text(encoding="utf-8")
-        user_prompt = Path(USER_PROMPT_FILE).read_text(encoding="utf-8")
+        system_prompt = _read_prompt(SYSTEM_PROMPT_FILE)
+        user_prompt = _read_prompt(USER_PROMPT_FILE)
     except FileNotFoundError as e:
         raise RuntimeError(f"Could not find a required prompt file: {e}")
 
-    # Build the initial message list with the system prompt
-    messages = [
-        {"role": "system", "content": system_prompt.strip()}
-    ]
-
-    # Add each page's text as a separate user message
     if not ocr_pages:
         raise ValueError("Input ocr_pages list cannot be empty.")
 
+    # Pages without any visible text give the model nothing to extract from
+    if not any(page.strip() for page in ocr_pages):
+        semantic_logger.warning("OCR-Seiten enthalten keinen Text, LLM-Aufruf wird übersprungen")
+        return {}, 0.0
+
     num_pages = len(ocr_pages)
-        
-    for i, page_text in enumerate(ocr_pages):
-        message_content = f"Here is the text for Page {i + 1} of {num_pages}:\n\n---\n{page_text}\n---"
-        messages.append({"role": "user", "content": message_content})
+
+    # System prompt followed by each page's text as a separate user message
+    messages = [{"role": "system", "content": system_prompt.strip()}, *_page_messages(ocr_pages)]
 
     # Add the final user prompt to trigger the JSON generation
     messages.append({"role": "user", "content": user_prompt.strip()})
 
-    # Send the complete conversation to the chat endpoint
-    body = {"model": OLLAMA_MODEL, "messages": messages, "stream": False}
+    # Identical input was already extracted → reuse the cached result
+    cache_path = _llm_cache_path(messages)
+    if cache_path is not None:
+        cached = _read_llm_cache(cache_path)
+        if cached is not None:
+            semantic_logger.info("LLM-Ergebnis aus Cache geladen: %s", cache_path.name)
+            return cached, 0.0
 
-    # Suppress warnings
-    warnings.filterwarnings("ignore")
-    
-    semantic_logger.info(f"Sende {len(messages)} Nachrichten ({num_pages} Seiten) an das Chat-Modell")
+    # Stream the conversation and stop as soon as the JSON answer is complete
+    body = {"model": OLLAMA_MODEL, "messages": messages, "stream": True}
+
+    semantic_logger.info("Sende %d Nachrichten (%d Seiten) an das Chat-Modell", len(messages), num_pages)
     ollama_start_time = time.perf_counter()
-    resp = requests.post(CHAT_ENDPOINT, json=body, verify=False, timeout=600)
+    raw_content = _stream_chat(body, stop_after_json=True)
     ollama_duration = time.perf_counter() - ollama_start_time
 
-    if resp.status_code != 200:
-        raise RuntimeError(f"Ollama API Error: {resp.status_code} – {resp.text}")
-
-    # Extract the JSON from the final assistant message
-    try:
-        raw_content = resp.json().get("message", {}).get("content", "")
-    except (AttributeError, KeyError):
-        raise ValueError("Ollama chat response is not in the expected format.")
-
-    semantic_logger.debug(f"Ollama Antwort: {raw_content}")
+    semantic_logger.debug("Ollama Antwort: %s", raw_content)
     json_chunk = _extract_first_complete_json(raw_content)
 
     if not json_chunk:
         raise ValueError("Could not find a complete JSON object in Ollama response:\n" + raw_content[:500])
 
-    # The {{...}} regex patch is no longer the primary method, but can serve as a fallback
-    json_chunk = re.sub(r'^\{\{(.*)\}\}$', r'{\1}', json_chunk, count=1, flags=re.DOTALL)
+    # The {{...}} patch is no longer the primary method, but can serve as a fallback
+    if json_chunk.startswith('{{') and json_chunk.endswith('}}'):
+        json_chunk = json_chunk[1:-1]
 
     try:
-        return json.loads(json_chunk), ollama_duration
+        extracted_fields = json.loads(json_chunk)
     except json.JSONDecodeError as e:
         raise ValueError(f"JSON still malformed after processing: {e}\nChunk:\n{json_chunk!r}")
 
+    if cache_path is not None:
+        _write_llm_cache(cache_path, extracted_fields)
+
+    return extracted_fields, ollama_duration
+
 
 def ollama_process_with_custom_prompt(ocr_pages: List[str], prompt: str) -> str:
     """
@@ -154,26 +365,18 @@ def ollama_process_with_custom_prompt(ocr_pages: List[str], prompt: str) -> str:
     """
     # Load the system prompt for PDF querying
     try:
-        system_prompt = Path(PDF_QUERY_SYSTEM_PROMPT).read_text(encoding="utf-8")
+        system_prompt = _read_prompt(PDF_QUERY_SYSTEM_PROMPT)
     except FileNotFoundError as e:
         # Fall back to a generic system prompt if the file is missing
         system_prompt = "You are a helpful assistant for document processing."
         semantic_logger.warning(f"PDF-Query System-Prompt-Datei nicht gefunden: {e}")
     
-    # Build the message list with the system prompt
-    messages = [
-        {"role": "system", "content": system_prompt.strip()}
-    ]
-
-    # Add each page's text as a separate user message
-    num_pages = len(ocr_pages)
-    for i, page_text in enumerate(ocr_pages):
-        message_content = f"Here is the text for Page {i + 1} of {num_pages}:\n\n---\n{page_text}\n---"
-        messages.append({"role": "user", "content": message_content})
+    # System prompt followed by each page's text as a separate user message
+    messages = [{"role": "system", "content": system_prompt.strip()}, *_page_messages(ocr_pages)]
 
     # Load the user prompt template if available
     try:
-        user_prompt_template = Path(PDF_QUERY_USER_PROMPT).read_text(encoding="utf-8")
+        user_prompt_template = _read_prompt(PDF_QUERY_USER_PROMPT)
         # Replace the placeholder with the user's custom prompt
         user_prompt = user_prompt_template.replace("[Hier den OCR-Rohtext einfügen]", "")
         # Add the custom prompt at the end
@@ -186,23 +389,10 @@ def ollama_process_with_custom_prompt(ocr_pages: List[str], prompt: str) -> str:
     # Add the final user prompt
     messages.append({"role": "user", "content": final_prompt})
 
-    # Send the complete conversation to the chat endpoint
-    body = {"model": OLLAMA_MODEL, "messages": messages, "stream": False}
-
-    # Suppress warnings
-    warnings.filterwarnings("ignore")
-    
-    resp = requests.post(CHAT_ENDPOINT, json=body, verify=False, timeout=600)
-
-    if resp.status_code != 200:
-        raise RuntimeError(f"Ollama API Error: {resp.status_code} – {resp.text}")
+    # Stream the complete conversation; the answer is free text, so read it to the end
+    body = {"model": OLLAMA_MODEL, "messages": messages, "stream": True}
 
-    # Extract the raw content from the response
-    try:
-        raw_content = resp.json().get("message", {}).get("content", "")
-        return raw_content
-    except (AttributeError, KeyError, json.JSONDecodeError) as e:
-        raise ValueError(f"Ollama chat response is not in the expected format: {e}")
+    return _stream_chat(body)
 
 
 def _extract_first_complete_json(text: str) -> str | None:
@@ -226,36 +416,34 @@ def _extract_first_complete_json(text: str) -> str | None:
       
     """
     # --- NEW LOGIC: Prioritize finding content within <json_output> tags ---
-    try:
-        # Using regex to find content between the start and end tags, across multiple lines
-        tag_match = re.search(r'<json_output>(.*?)</json_output>', text, re.DOTALL)
-        if tag_match:
-            # If tags are found, we work only with the content inside them
-            text = tag_match.group(1).strip()
-    except re.error:
-        pass  # In case of a regex error, fall back to the old method
+    # Using regex to find content between the start and end tags, across multiple lines
+    tag_match = _JSON_OUTPUT_TAG_RE.search(text)
+    if tag_match:
+        # If tags are found, we work only with the content inside them
+        text = tag_match.group(1).strip()
 
     # --- Fallback Logic: Find the first brace-balanced object ---
     start = text.find("{")
     if start == -1:
         return None
 
-    depth, in_string, escape = 0, False, False
-    for idx, ch in enumerate(text[start:], start=start):
-        if in_string:
-            if escape:
-                escape = False
-            elif ch == "\\":
-                escape = True
-            elif ch == '"':
-                in_string = False
-        else:
-            if ch == '"':
-                in_string = True
-            elif ch == "{":
-                depth += 1
-            elif ch == "}":
-                depth -= 1
-                if depth == 0:
-                    return text[start: idx + 1]
+    # Fast path: valid JSON is delimited by the C decoder
+    try:
+        _, end = _JSON_DECODER.raw_decode(text, start)
+        return text[start:end]
+    except json.JSONDecodeError:
+        pass  # Malformed (e.g. {{...}}), fall back to the brace scan
+
+    # Only visit strings and braces; string bodies are skipped inside the regex engine
+    depth = 0
+    for token in _JSON_SCAN_RE.finditer(text, start):
+        ch = token.group()
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start: token.end()]
+        elif ch == '"':
+            return None  # Unterminated string
     return None
\ No newline at end of file
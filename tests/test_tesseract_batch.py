@@ -0,0 +1,59 @@
+"""
+Tests für die Aufteilung der Tesseract-Batch-Ausgabe in Seitentexte.
+"""
+
+import os
+import shutil
+
+import pytest
+from PIL import Image, ImageDraw
+
+# app.config bricht ohne diese Variablen beim Import ab
+os.environ.setdefault("OLLAMA_BASE_URL", "http://127.0.0.1:11434")
+os.environ.setdefault("OLLAMA_MODEL", "test-model")
+
+from app.ocr.tesseract_ocr import _split_batch_output, tesseract_pngs_to_text  # noqa: E402
+
+
+def test_separator_between_pages():
+    assert _split_batch_output("Seite 1\fSeite 2\fSeite 3", 3) == ["Seite 1", "Seite 2", "Seite 3"]
+
+
+def test_trailing_separator_after_last_page_is_dropped():
+    assert _split_batch_output("Seite 1\fSeite 2\f", 2) == ["Seite 1", "Seite 2"]
+
+
+def test_blank_last_page_is_kept():
+    # Tesseract 5: "Rechnung" + separator + empty text of the blank back side
+    assert _split_batch_output("Rechnung\n\f", 2) == ["Rechnung\n", ""]
+
+
+def test_blank_last_page_with_trailing_separator_is_kept():
+    assert _split_batch_output("Rechnung\n\f\f", 2) == ["Rechnung\n", ""]
+
+
+def test_unexpected_page_count_is_not_hidden():
+    assert len(_split_batch_output("nur eine Seite", 2)) == 1
+
+
+@pytest.mark.skipif(shutil.which("tesseract") is None, reason="Tesseract-CLI nicht installiert")
+def test_batch_run_with_blank_last_page(tmp_path, monkeypatch):
+    import app.ocr.tesseract_ocr as tesseract_ocr
+
+    def per_page_fallback(png_path):
+        raise AssertionError(f"Batch-Ausgabe verworfen, Einzel-OCR für {png_path}")
+
+    monkeypatch.setattr(tesseract_ocr, "tesseract_png_to_text", per_page_fallback)
+
+    text_page = Image.new("L", (1200, 400), 255)
+    ImageDraw.Draw(text_page).text((50, 150), "Rechnung 4711", fill=0, font_size=60)
+    text_path = tmp_path / "page1.png"
+    text_page.save(text_path)
+    blank_path = tmp_path / "page2.png"
+    Image.new("L", (1200, 400), 255).save(blank_path)
+
+    page_texts = tesseract_pngs_to_text([str(text_path), str(blank_path)])
+
+    assert len(page_texts) == 2
+    assert "4711" in page_texts[0]
+    assert not page_texts[1].strip()